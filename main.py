@@ -1,12 +1,20 @@
+import asyncio
 import logging
 import os
 import json
 import csv
-import time
+import random
+import shelve
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-import requests
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 from pathlib import Path
 
 CONFIG_PATH = Path("config.json")
@@ -72,18 +80,16 @@ def get_alpaca_credentials_from_config_or_prompt(config: dict) -> tuple[str, str
     return api_key, api_secret, base_url
 
 
-def build_alpaca_headers(api_key_id: str, api_secret_key: str) -> dict:
-    return {
-        "APCA-API-KEY-ID": api_key_id,
-        "APCA-API-SECRET-KEY": api_secret_key,
-    }
-
-
 config = load_config()
 api_key_id, api_secret_key, base_url = get_alpaca_credentials_from_config_or_prompt(config)
 BASE_URL = base_url
 TRADING_API = f"{BASE_URL}/v2"
-HEADERS = build_alpaca_headers(api_key_id, api_secret_key)
+# Installed once on the shared client at construction; no call passes
+# headers individually.
+HEADERS = {
+    "APCA-API-KEY-ID": api_key_id,
+    "APCA-API-SECRET-KEY": api_secret_key,
+}
 
 
 # Make a data export folder
@@ -95,8 +101,12 @@ def mkdir_export_dir() -> pathlib.Path:
 
 
 def save_json(path: pathlib.Path, obj):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    # orjson always emits UTF-8 bytes; one write_bytes call hands the
+    # whole buffer to the OS with no file-object layering in between
+    Path(path).write_bytes(orjson.dumps(
+        obj,
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    ))
 
 
 def _save_csv(path: pathlib.Path, items):
@@ -108,39 +118,114 @@ def _save_csv(path: pathlib.Path, items):
         # Create empty file with no rows
         pathlib.Path(path).write_text("", encoding="utf-8")
         return
-    # Normalize fields
-    all_keys = set()
-    for it in items:
-        all_keys.update(it.keys())
-    fieldnames = sorted(all_keys)
+    # pandas unions the fields in first-seen order and writes the rows
+    # in C, avoiding a per-row Python loop
+    pd.DataFrame(items).to_csv(path, index=False)
+
+
+def _save_kv_csv(path: pathlib.Path, obj: dict):
+    # Single-object payloads (account, clock, summary) don't need the
+    # DataFrame machinery: a two-column key/value CSV is enough.
+    # csv.writer takes the rows as positional tuples (no per-cell key
+    # lookups) and quotes values that contain commas.
     with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        for it in items:
-            w.writerow({k: it.get(k, None) for k in fieldnames})
+        w = csv.writer(f)
+        w.writerow(("key", "value"))
+        w.writerows(obj.items())
+
+
+def _save_parquet(path: pathlib.Path, items):
+    # Columnar sibling of the CSV export: keeps dtypes (CSV coerces
+    # everything to text) and is far cheaper to load back into pandas.
+    if isinstance(items, dict):
+        items = [items]
+    if not items:
+        return
+    # Go through pandas so the schema is the union of every record's
+    # fields; from_pylist infers it from the first record only and drops
+    # columns that first appear later (e.g. DIV activities' net_amount)
+    tbl = pa.Table.from_pandas(pd.DataFrame(items), preserve_index=False)
+    pq.write_table(tbl, str(path), compression="zstd")
+
+
+def _save_feather(path: pathlib.Path, items):
+    # Arrow IPC sibling for the biggest exports: skips CSV quoting and
+    # escaping on write, and pd.read_feather can memory-map it back in
+    # without reparsing.
+    if isinstance(items, dict):
+        items = [items]
+    if not items:
+        return
+    # Same as _save_parquet: build through pandas for the full field
+    # union rather than from_pylist's first-record schema inference
+    tbl = pa.Table.from_pandas(pd.DataFrame(items), preserve_index=False)
+    feather.write_feather(tbl, str(path), compression="zstd")
+
+
+# 429 responses endured by the most recent _aget call (reset when the
+# next call starts, not when it succeeds); pagination reads it to shrink
+# page sizes when the previous page needed repeated retries.
+_last_429s = 0
+
+# On-disk ETag cache so unchanged payloads come back as cheap 304s on
+# repeat runs. Only used for the non-paginated endpoints.
+CACHE_PATH = Path("./alpaca_cache")
 
 
-def _robust_get(url, headers, params=None):
+def _cache_key(path, params):
+    return path + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+
+
+async def _aget(client, path, params=None, use_cache=False):
+    """
+    GET with retries on the shared httpx client.
+    """
+    global _last_429s
+    _last_429s = 0
+    cached_etag, cached_body = None, None
+    if use_cache:
+        with shelve.open(str(CACHE_PATH)) as cache:
+            cached_etag, cached_body = cache.get(_cache_key(path, params), (None, None))
+    extra_headers = {"If-None-Match": cached_etag} if cached_etag else None
     for attempt in range(5):
-        r = requests.get(url, headers=headers, params=params, timeout=30)
+        r = await client.get(path, params=params, headers=extra_headers)
+        if r.status_code == 304 and cached_body is not None:
+            return httpx.Response(200, content=cached_body, request=r.request)
         if r.status_code == 429:
-            time.sleep(1 + attempt)
+            _last_429s += 1
+            # Honor Retry-After if Alpaca sent one, else back off
+            # exponentially with jitter so retries don't pile up.
+            retry_after = r.headers.get("Retry-After")
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(60, 0.5 * 2 ** attempt) + random.random() * 0.25
+            await asyncio.sleep(delay)
             continue
         if r.status_code == 404:
-            time.sleep(1 + attempt)
+            await asyncio.sleep(1 + attempt)
             logging.error("API keys are not valid. \n"
                           "Please double-check input or config.json and your website API info.")
             continue
         r.raise_for_status()
+        if use_cache and r.headers.get("ETag"):
+            with shelve.open(str(CACHE_PATH)) as cache:
+                cache[_cache_key(path, params)] = (r.headers["ETag"], r.content)
         return r
 
 
-def collect_with_pagination(url, headers, initial_params=None, hard_limit=None):
+async def collect_with_pagination(client, path, initial_params=None, hard_limit=None):
     items = []
     params = dict(initial_params or {})
     seen = 0
     while True:
-        r = _robust_get(url, headers=headers, params=params)
+        # If the previous page only got through after repeated 429s, ask
+        # for smaller pages instead of hammering with full-size requests.
+        if _last_429s >= 3:
+            for key in ("limit", "page_size"):
+                if key in params:
+                    params[key] = max(1, int(params[key]) // 2)
+        r = await _aget(client, path, params=params)
         data = r.json()
         # If the endpoint returns a list directly
         if isinstance(data, list):
@@ -154,9 +239,9 @@ def collect_with_pagination(url, headers, initial_params=None, hard_limit=None):
                 items.extend(data["activities"])
             else:
                 # Fallback: try to detect first list in dict
-                list_values = [v for v in data.values() if isinstance(v, list)]
-                if list_values:
-                    items.extend(list_values[0])
+                first_list = next((v for v in data.values() if isinstance(v, list)), None)
+                if first_list is not None:
+                    items.extend(first_list)
                 else:
                     # No list, assume single object
                     items.append(data)
@@ -177,26 +262,27 @@ def collect_with_pagination(url, headers, initial_params=None, hard_limit=None):
             next_token = r.headers.get("x-next-page-token") or r.headers.get("next_page_token")
 
         if next_token:
-            params = dict(params)
+            # params was copied once on entry, so mutate it in place
+            # instead of reallocating a dict every page
             params["page_token"] = next_token
         else:
             break
     return items
 
 
-def get_account():
-    return _robust_get(f"{TRADING_API}/account", headers=HEADERS).json()
+async def get_account(client):
+    return (await _aget(client, "/account", use_cache=True)).json()
 
 
-def get_clock():
-    return _robust_get(f"{TRADING_API}/clock", headers=HEADERS).json()
+async def get_clock(client):
+    return (await _aget(client, "/clock")).json()
 
 
-def get_positions():
-    return _robust_get(f"{TRADING_API}/positions", headers=HEADERS).json()
+async def get_positions(client):
+    return (await _aget(client, "/positions")).json()
 
 
-def get_orders(after_iso=None, until_iso=None, status="all", limit=100):
+async def get_orders(client, after_iso=None, until_iso=None, status="all", limit=100):
     params = {
         "status": status,
         "limit": min(limit, 500),
@@ -206,10 +292,10 @@ def get_orders(after_iso=None, until_iso=None, status="all", limit=100):
         params["after"] = after_iso
     if until_iso:
         params["until"] = until_iso
-    return collect_with_pagination(f"{TRADING_API}/orders", HEADERS, params)
+    return await collect_with_pagination(client, "/orders", params)
 
 
-def get_activities(activity_types=None, after_iso=None, until_iso=None, direction="desc", page_limit=100):
+async def get_activities(client, activity_types=None, after_iso=None, until_iso=None, direction="desc", page_limit=100):
     """
     Activity types examples: FILL, TRANS, TRADE, DIV, MISC, etc.
     """
@@ -224,16 +310,30 @@ def get_activities(activity_types=None, after_iso=None, until_iso=None, directio
         params["after"] = after_iso
     if until_iso:
         params["until"] = until_iso
-    return collect_with_pagination(f"{TRADING_API}/account/activities", HEADERS, params)
+    return await collect_with_pagination(client, "/account/activities", params)
 
 
-def get_portfolio_history(period="1A", timeframe="1D", extended_hours="false"):
+async def get_portfolio_history(client, period="1A", timeframe="1D", extended_hours="false"):
     params = {
         "period": period,  # 1D, 1W, 1M, 3M, 6M, 1A, all
         "timeframe": timeframe,  # 1Min, 5Min, 15Min, 1H, 1D
         "extended_hours": extended_hours,
     }
-    return _robust_get(f"{TRADING_API}/account/portfolio/history", HEADERS, params).json()
+    r = await _aget(client, "/account/portfolio/history", params=params, use_cache=True)
+    # Potentially large parallel arrays (1Min timeframe); orjson parses
+    # them much faster than the stdlib json behind r.json()
+    ph = orjson.loads(r.content)
+    if isinstance(ph, dict):
+        # Decode the parallel arrays into NumPy so normalization and the
+        # columnar writers work on native buffers instead of Python lists
+        for key, dtype in (("timestamp", np.int64), ("equity", np.float64),
+                           ("profit_loss", np.float64), ("profit_loss_pct", np.float64)):
+            if isinstance(ph.get(key), list):
+                try:
+                    ph[key] = np.asarray(ph[key], dtype=dtype)
+                except (TypeError, ValueError):
+                    pass  # nulls in the array -> keep the plain list
+    return ph
 
 
 def normalize_portfolio_history_to_rows(ph_json):
@@ -242,36 +342,40 @@ def normalize_portfolio_history_to_rows(ph_json):
     """
     if not isinstance(ph_json, dict) or "timestamp" not in ph_json:
         return []
-    ts = ph_json.get("timestamp", []) or []
-    eq = ph_json.get("equity", []) or []
-    pl = ph_json.get("profit_loss", []) or []
-    pl_pct = ph_json.get("profit_loss_pct", []) or []
-    base = ph_json.get("base_value", None)
-
-    rows = []
-    for i in range(len(ts)):
-        rows.append({
-            "timestamp": ts[i],
-            "datetime_utc": datetime.fromtimestamp(ts[i], tz=timezone.utc).isoformat(),
-            "equity": eq[i] if i < len(eq) else None,
-            "profit_loss": pl[i] if i < len(pl) else None,
-            "profit_loss_pct": pl_pct[i] if i < len(pl_pct) else None,
-            "base_value": base,
-            "timeframe": ph_json.get("timeframe"),
-        })
-    return rows
+    ts = ph_json.get("timestamp")
+    if ts is None or len(ts) == 0:
+        return []
+    n = len(ts)
+
+    def _col(key):
+        # Pad shorter arrays so every column has n rows
+        vals = ph_json.get(key)
+        return pd.Series(vals[:n] if vals is not None else []).reindex(range(n))
+
+    df = pd.DataFrame({"timestamp": ts})
+    # One vectorized conversion instead of datetime.fromtimestamp per row;
+    # epoch seconds are whole, so the fixed +00:00 suffix matches isoformat()
+    df["datetime_utc"] = pd.to_datetime(df["timestamp"], unit="s", utc=True).dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    df["equity"] = _col("equity")
+    df["profit_loss"] = _col("profit_loss")
+    df["profit_loss_pct"] = _col("profit_loss_pct")
+    df["base_value"] = ph_json.get("base_value", None)
+    df["timeframe"] = ph_json.get("timeframe")
+    return df.to_dict("records")
 
 
 def to_dataframe_safe(items):
     if isinstance(items, dict):
         return pd.DataFrame([items])
     if isinstance(items, list) and items and isinstance(items[0], dict):
-        return pd.DataFrame(items)
+        # Alpaca rows share a schema, so seed the columns from the first
+        # row instead of letting pandas scan every dict to infer them
+        return pd.DataFrame.from_records(items, columns=list(items[0].keys()))
     # Fallback: wrap raw
     return pd.DataFrame({"value": [items]})
 
 
-def main():
+async def main():
     outdir = mkdir_export_dir()
     # Time window defaults: last 180 days for orders/activities
     until_dt = datetime.now(timezone.utc)
@@ -280,36 +384,75 @@ def main():
     until_iso = until_dt.isoformat()
 
     print(f"Export directory: {outdir}")
-    print("Fetching account...")
-    account = get_account()
-    save_json(outdir / "account.json", account)
-    _save_csv(outdir / "account.csv", account)
-
-    print("Fetching market clock...")
-    clock = get_clock()
-    save_json(outdir / "clock.json", clock)
-    _save_csv(outdir / "clock.csv", clock)
-
-    print("Fetching positions...")
-    positions = get_positions()
-    save_json(outdir / "positions.json", positions)
-    _save_csv(outdir / "positions.csv", positions)
-
-    print(f"Fetching orders (status=all)...")
-    orders = get_orders(after_iso=after_iso, until_iso=until_iso, status="all", limit=500)
-    save_json(outdir / "orders.json", orders)
-    _save_csv(outdir / "orders.csv", orders)
-
-    print(f"Fetching activities...")
-    activities = get_activities(after_iso=after_iso, until_iso=until_iso, direction="desc", page_limit=100)
-    save_json(outdir / "activities.json", activities)
-    _save_csv(outdir / "activities.csv", activities)
-
-    print("Fetching portfolio history (1 year, 1D candles)...")
-    ph = get_portfolio_history(period="1A", timeframe="1D", extended_hours="false")
-    ph_rows = normalize_portfolio_history_to_rows(ph)
-    save_json(outdir / "portfolio_history_raw.json", ph)
-    _save_csv(outdir / "portfolio_history_rows.csv", ph_rows)
+    print("Fetching account, market clock, positions and portfolio history...")
+    # Disk writes run on a small pool so flushing one payload overlaps
+    # the network wait for the next instead of blocking it. Futures are
+    # kept so write failures surface at the end instead of vanishing.
+    io_pool = ThreadPoolExecutor(max_workers=2)
+    write_futures = []
+
+    def queue_write(save_fn, path, obj):
+        write_futures.append(io_pool.submit(save_fn, path, obj))
+
+    async with httpx.AsyncClient(
+        base_url=TRADING_API,
+        headers=HEADERS,
+        # HTTP/2 multiplexes the concurrent calls as streams over one
+        # TCP+TLS connection, so the paginated chains don't block each other
+        http2=True,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        timeout=30,
+    ) as client:
+        # Kick off the two slow paginated chains immediately; their page
+        # loops run as HTTP/2 streams the whole time the quick endpoints
+        # (and their disk writes) are being handled below.
+        orders_task = asyncio.create_task(
+            get_orders(client, after_iso=after_iso, until_iso=until_iso, status="all", limit=500)
+        )
+        activities_task = asyncio.create_task(
+            get_activities(client, after_iso=after_iso, until_iso=until_iso, direction="desc", page_limit=100)
+        )
+
+        # These four endpoints are independent, so fetch them concurrently:
+        # total wall time is the slowest call instead of the sum of all four.
+        account, clock, positions, ph = await asyncio.gather(
+            get_account(client),
+            get_clock(client),
+            get_positions(client),
+            get_portfolio_history(client, period="1A", timeframe="1D", extended_hours="false"),
+        )
+
+        # Queue the finished payloads for writing while the paginated
+        # fetches are still on the wire.
+        queue_write(save_json, outdir / "account.json", account)
+        queue_write(_save_kv_csv, outdir / "account.csv", account)
+
+        queue_write(save_json, outdir / "clock.json", clock)
+        queue_write(_save_kv_csv, outdir / "clock.csv", clock)
+
+        queue_write(save_json, outdir / "positions.json", positions)
+        queue_write(_save_csv, outdir / "positions.csv", positions)
+
+        ph_rows = normalize_portfolio_history_to_rows(ph)
+        queue_write(save_json, outdir / "portfolio_history_raw.json", ph)
+        queue_write(_save_csv, outdir / "portfolio_history_rows.csv", ph_rows)
+        queue_write(_save_parquet, outdir / "portfolio_history_rows.parquet", ph_rows)
+
+        print(f"Fetching orders (status=all) and activities...")
+        # The two paginated endpoints chain page tokens serially within
+        # themselves, but are independent of each other, so their page
+        # loops interleave on the event loop.
+        orders, activities = await asyncio.gather(orders_task, activities_task)
+
+    queue_write(save_json, outdir / "orders.json", orders)
+    queue_write(_save_csv, outdir / "orders.csv", orders)
+    queue_write(_save_parquet, outdir / "orders.parquet", orders)
+    queue_write(_save_feather, outdir / "orders.feather", orders)
+
+    queue_write(save_json, outdir / "activities.json", activities)
+    queue_write(_save_csv, outdir / "activities.csv", activities)
+    queue_write(_save_parquet, outdir / "activities.parquet", activities)
+    queue_write(_save_feather, outdir / "activities.feather", activities)
 
     # Summary table
     summary = {
@@ -318,22 +461,31 @@ def main():
         "activities_rows": len(activities) if isinstance(activities, list) else 1,
         "positions_rows": len(positions) if isinstance(positions, list) else 1,
     }
-    save_json(outdir / "summary.json", summary)
-    _save_csv(outdir / "summary.csv", summary)
+    queue_write(save_json, outdir / "summary.json", summary)
+    queue_write(_save_kv_csv, outdir / "summary.csv", summary)
+
+    # Make sure every queued write hits disk before reporting done.
+    # shutdown() alone swallows worker exceptions, so re-raise any write
+    # failure here rather than printing Done with files missing.
+    io_pool.shutdown(wait=True)
+    for fut in write_futures:
+        fut.result()
 
     # Optional: quick human-readable preview via pandas (not required)
+    # Slice before building the frames so previewing thousands of rows
+    # only ever pays for the handful actually shown
     """try:
         print("\n=== Quick preview ===")
         print("Account:")
-        print(to_dataframe_safe(account).head(3).to_string(index=False))
+        print(to_dataframe_safe(account).to_string(index=False))
         print("\nPositions:")
-        print(to_dataframe_safe(positions).head(5).to_string(index=False))
+        print(to_dataframe_safe(positions[:5]).to_string(index=False))
         print("\nRecent Orders:")
-        print(to_dataframe_safe(orders).head(5).to_string(index=False))
+        print(to_dataframe_safe(orders[:5]).to_string(index=False))
         print("\nActivities:")
-        print(to_dataframe_safe(activities).head(5).to_string(index=False))
+        print(to_dataframe_safe(activities[:5]).to_string(index=False))
         print("\nPortfolio History (first 5 rows):")
-        print(pd.DataFrame(ph_rows).head(5).to_string(index=False))
+        print(pd.DataFrame(ph_rows[:5]).to_string(index=False))
     except Exception as e:
         # Keep export resilient even if preview fails
         print(f"(Preview skipped: {e})")"""
@@ -342,4 +494,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())